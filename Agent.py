@@ -1,26 +1,170 @@
+import json
 import logging
-from typing import Dict, Any, List, Optional
-from langchain.agents import AgentExecutor, initialize_agent
+import re
+from typing import Dict, Any, Generator, Iterator, List, Optional, Union
+from langchain.agents import AgentExecutor, AgentOutputParser
+from langchain.agents.format_scratchpad import format_log_to_str
 from langchain.llms.base import LLM
+from langchain.memory import ConversationSummaryBufferMemory
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.exceptions import OutputParserException
+from langchain_core.outputs import GenerationChunk
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnablePassthrough
 from langchain.tools import Tool
+from langchain.tools.render import render_text_description_and_args
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
-from toolkit import AgentToolkit
+from langchain_community.llms.utils import enforce_stop_tokens
+from toolkit import AgentToolkit, CortexStreamError, cortex_complete, cortex_stream
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Number of most recent (action, observation) pairs replayed to the model on each step.
+MAX_INTERMEDIATE_STEPS = 5
+# Token budget for verbatim chat history; older turns are folded into a running summary.
+MAX_HISTORY_TOKENS = 1500
+
+SYSTEM_MESSAGE = """
+You are a helpful assistant for analyzing and optimizing queries running on Snowflake to reduce resource consumption and improve performance.
+If the user's question is not related to query analysis or optimization, then politely refuse to answer it.
+Scope: Only analyze and optimize SELECT queries. Do not run any queries that mutate the data warehouse (e.g., CREATE, UPDATE, DELETE, DROP).
+YOU SHOULD FOLLOW THIS PLAN and seek approval from the user at every step before proceeding further:
+1. Identify Expensive Queries
+    - For a given date range (default: last 7 days), identify the top 20 most expensive `SELECT` queries using the `SNOWFLAKE`.`ACCOUNT_USAGE`.`QUERY_HISTORY` view.
+    - Criteria for "most expensive" can be based on execution time or data scanned.
+    - Prefer the find_expensive_queries tool for this step over writing the query yourself.
+2. Analyze Query Structure
+    - For each identified query, determine the tables being referenced in it and then get the schemas of these tables to under their structure.
+    - Whenever several tool calls do not depend on each other (e.g. getting the schemas of many tables), batch them into a single sql_parallel_plan call so that they run concurrently.
+3. Suggest Optimizations
+    - With the above context in mind, analyze the query logic to identify potential improvements.
+    - Provide clear reasoning for each suggested optimization, specifying which metric (e.g., execution time, data scanned) the optimization aims to improve.
+4. Validate Improvements
+    - Run the original and optimized queries to compare performance metrics.
+    - Ensure the output data of the optimized query matches the original query to verify correctness.
+    - Compare key metrics such as execution time and data scanned, using the query_id obtained from running the queries and the `SNOWFLAKE`.`ACCOUNT_USAGE`.`QUERY_HISTORY` view.
+5. Prepare Summary
+    - Document the approach and methodology used for analyzing and optimizing the queries.
+    - Summarize the results, including:
+        - Original vs. optimized query performance
+        - Metrics improved
+        - Any notable observations or recommendations for further action
+
+You have access to the following tools:
+{tools}
+
+Call a tool by replying with exactly one JSON blob, with an "action" key (the tool name) and an "action_input" key (the tool input):
+```
+{{"action": $TOOL_NAME, "action_input": $INPUT}}
+```
+Valid "action" values: "Final Answer" or {tool_names}
+After each blob, wait for the Observation. To answer the user, reply with {{"action": "Final Answer", "action_input": $ANSWER}}.
+"""
+
+PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", SYSTEM_MESSAGE),
+        MessagesPlaceholder("chat_history", optional=True),
+        ("human", "{input}\n\n{agent_scratchpad}"),
+    ]
+)
+
+# Matches a fenced action blob, e.g. ```json {"action": ...} ```; only fences opening on a JSON object.
+_FENCED_ACTION_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+# Matches a bare JSON action blob when the model omits the fence.
+_BARE_ACTION_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+class FastJSONAgentOutputParser(AgentOutputParser):
+    """Parses JSON tool calls from the model output using precompiled patterns."""
+
+    def parse(self, text: str) -> Union[AgentAction, AgentFinish]:
+        # The whole output is tried first: answers routinely embed ```sql fences, which must
+        # not be mistaken for the action blob.
+        candidates = [text.strip()]
+        candidates += [m.group(1) for m in _FENCED_ACTION_RE.finditer(text)]
+        bare = _BARE_ACTION_RE.search(text)
+        if bare:
+            candidates.append(bare.group(0))
+        for candidate in candidates:
+            try:
+                response = json.loads(candidate, strict=False)
+                if isinstance(response, list):
+                    response = response[0]
+                action = response["action"]
+            except (ValueError, KeyError, IndexError, TypeError):
+                continue
+            if action == "Final Answer":
+                return AgentFinish({"output": response.get("action_input", "")}, text)
+            return AgentAction(action, response.get("action_input", {}), text)
+        raise OutputParserException(f"Could not parse LLM output: {text}")
+
+    @property
+    def _type(self) -> str:
+        return "fast_json_agent"
+
+def _until_stop(chunks: Generator[str, None, None], stop: Optional[List[str]]) -> Iterator[str]:
+    """Yield the streamed text up to the first stop sequence, which may span chunks."""
+    stop = [s for s in stop or [] if s]
+    if not stop:
+        yield from chunks
+        return
+    # Hold back the tail that could be the start of a stop sequence split across chunks.
+    keep = max(len(s) for s in stop) - 1
+    pending = ""
+    try:
+        for text in chunks:
+            pending += text
+            index = min((i for i in (pending.find(s) for s in stop) if i >= 0), default=-1)
+            if index >= 0:
+                if index:
+                    yield pending[:index]
+                return
+            if len(pending) > keep:
+                yield pending[:len(pending) - keep]
+                pending = pending[len(pending) - keep:]
+        if pending:
+            yield pending
+    finally:
+        # Cortex COMPLETE has no stop parameter; closing the stream stops the download.
+        chunks.close()
+
 class SnowflakeCortexLLM(LLM):
-    conn: Any
+    pool: Any
+    streaming: bool = True
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        if self.streaming:
+            try:
+                return "".join(chunk.text for chunk in self._stream(prompt, stop, run_manager, **kwargs))
+            except CortexStreamError:
+                pass
+        completion = cortex_complete(self.pool, prompt)
+        return enforce_stop_tokens(completion, stop) if stop else completion
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        for text in _until_stop(cortex_stream(self.pool, prompt), stop):
+            chunk = GenerationChunk(text=text)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
 
-    def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
-        query = f"SELECT SNOWFLAKE.CORTEX.COMPLETE('snowflake-arctic', '{prompt}');"
-        logger.info(f"Executing Cortex query: {query}")
-        result = pd.read_sql(query, self.conn)
-        logger.info(f"Cortex inference result: {result.iloc[0, 0]}")
-        return result.iloc[0, 0]
+    def get_num_tokens(self, text: str) -> int:
+        # Roughly four characters per token; avoids pulling in a tokenizer just to size the history.
+        return len(text) // 4
 
     @property
     def _identifying_params(self) -> Dict[str, Any]:
@@ -33,53 +177,43 @@ class SnowflakeCortexLLM(LLM):
 class Agent:
     agent_executor: AgentExecutor
 
-    def __init__(self, conn: Any):
+    def __init__(self, pool: Any):
         logger.info("Initializing Agent")
-        snowflake_llm = SnowflakeCortexLLM(conn=conn)
-        toolkit = AgentToolkit(llm=snowflake_llm, conn=conn)
+        snowflake_llm = SnowflakeCortexLLM(pool=pool)
+        toolkit = AgentToolkit(llm=snowflake_llm, pool=pool)
         tools = toolkit.get_tools()
 
-        system_message = """
-        You are a helpful assistant for analyzing and optimizing queries running on Snowflake to reduce resource consumption and improve performance.
-        If the user's question is not related to query analysis or optimization, then politely refuse to answer it.
-        Scope: Only analyze and optimize SELECT queries. Do not run any queries that mutate the data warehouse (e.g., CREATE, UPDATE, DELETE, DROP).
-        YOU SHOULD FOLLOW THIS PLAN and seek approval from the user at every step before proceeding further:
-        1. Identify Expensive Queries
-            - For a given date range (default: last 7 days), identify the top 20 most expensive `SELECT` queries using the `SNOWFLAKE`.`ACCOUNT_USAGE`.`QUERY_HISTORY` view.
-            - Criteria for "most expensive" can be based on execution time or data scanned.
-        2. Analyze Query Structure
-            - For each identified query, determine the tables being referenced in it and then get the schemas of these tables to under their structure.
-        3. Suggest Optimizations
-            - With the above context in mind, analyze the query logic to identify potential improvements.
-            - Provide clear reasoning for each suggested optimization, specifying which metric (e.g., execution time, data scanned) the optimization aims to improve.
-        4. Validate Improvements
-            - Run the original and optimized queries to compare performance metrics.
-            - Ensure the output data of the optimized query matches the original query to verify correctness.
-            - Compare key metrics such as execution time and data scanned, using the query_id obtained from running the queries and the `SNOWFLAKE`.`ACCOUNT_USAGE`.`QUERY_HISTORY` view.
-        5. Prepare Summary
-            - Document the approach and methodology used for analyzing and optimizing the queries.
-            - Summarize the results, including:
-                - Original vs. optimized query performance
-                - Metrics improved
-                - Any notable observations or recommendations for further action
-        """
-        
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", system_message),
-                MessagesPlaceholder("chat_history", optional=True),
-                ("human", "{input}"),
-                MessagesPlaceholder("agent_scratchpad"),
-            ]
+        memory = ConversationSummaryBufferMemory(
+            llm=snowflake_llm,
+            max_token_limit=MAX_HISTORY_TOKENS,
+            memory_key="chat_history",
+            input_key="input",
+            output_key="output",
+            return_messages=True,
         )
 
         logger.info("Initializing agent")
-        self.agent_executor = initialize_agent(
+        prompt = PROMPT.partial(
+            tools=render_text_description_and_args(list(tools)),
+            tool_names=", ".join(t.name for t in tools),
+        )
+        agent = (
+            RunnablePassthrough.assign(
+                agent_scratchpad=lambda x: format_log_to_str(x["intermediate_steps"]),
+            )
+            | prompt
+            | snowflake_llm.bind(stop=["\nObservation"])
+            | FastJSONAgentOutputParser()
+        )
+        self.agent_executor = AgentExecutor(
+            agent=agent,
             tools=tools,
-            llm=snowflake_llm,
-            agent="zero-shot-react-description",
+            memory=memory,
             verbose=True,
-            agent_kwargs={"system_message": system_message}
+            handle_parsing_errors=True,
+            trim_intermediate_steps=MAX_INTERMEDIATE_STEPS,
+            # Go through `_call`, which still streams tokens but can recover from a failed stream.
+            stream_runnable=False,
         )
         logger.info("Agent initialization complete")
     
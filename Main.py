@@ -2,6 +2,7 @@ import logging
 from langchain_community.callbacks.streamlit import StreamlitCallbackHandler
 import snowflake.connector
 import streamlit as st
+from sqlalchemy.pool import QueuePool
 from agent import Agent
 import pandas as pd
 
@@ -9,22 +10,41 @@ import pandas as pd
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Number of Snowflake connections shared by concurrent tool calls.
+POOL_SIZE = 8
+# Seconds after which a pooled connection is closed and reopened, well within Snowflake's idle session timeout.
+POOL_RECYCLE = 3600
+
 @st.cache_resource(ttl='5h')
-def get_connection(username, password, account, warehouse, role):
-    logger.info("Initializing database connection")
+def get_connection_pool(username, password, account, warehouse, role):
+    logger.info("Initializing database connection pool")
     database = "SNOWFLAKE"
     schema = "ACCOUNT_USAGE"
-    con = snowflake.connector.connect(
-        user=username,
-        password=password,
-        account=account,
-        database=database,
-        schema=schema,
-        warehouse=warehouse,
-        role=role,
+
+    def connect():
+        logger.info("Opening database connection")
+        return snowflake.connector.connect(
+            user=username,
+            password=password,
+            account=account,
+            database=database,
+            schema=schema,
+            warehouse=warehouse,
+            role=role,
+            # Bind parameters server-side so parameterized statements are sent as one SQL text.
+            paramstyle="qmark",
+        )
+
+    # The connections are autocommit, so skip the ROLLBACK round-trip on every check-in.
+    pool = QueuePool(
+        connect,
+        pool_size=POOL_SIZE,
+        max_overflow=0,
+        recycle=POOL_RECYCLE,
+        reset_on_return=None,
     )
-    logger.info("Database connection established")
-    return con
+    logger.info("Database connection pool established")
+    return pool
 
 st.set_page_config(page_title="Snow-Wise", page_icon="❄️")
 st.title("❄️ :blue[Snow-Wise]")
@@ -41,7 +61,7 @@ with st.sidebar:
     
     if snowflake_account and snowflake_username and snowflake_role and snowflake_password and snowflake_warehouse:
         logger.info("Initializing database connection and agent")
-        con = get_connection(
+        pool = get_connection_pool(
             username=snowflake_username,
             password=snowflake_password,
             account=snowflake_account,
@@ -49,9 +69,12 @@ with st.sidebar:
             role=snowflake_role,
         )
         
-        agent_executor = Agent(conn=con).get_executor()
-        logger.info("Agent executor initialized")
+        if st.session_state.get("agent_pool") is not pool:
+            st.session_state.agent_executor = Agent(pool=pool).get_executor()
+            st.session_state.agent_pool = pool
+            logger.info("Agent executor initialized")
 
+# Display-only transcript; the agent's own memory keeps a bounded, summarized history.
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
@@ -70,7 +93,7 @@ if prompt := st.chat_input("I need help with finding the long running queries on
     
     with st.chat_message("assistant"):
         st_callback = StreamlitCallbackHandler(st.container())
-        response = agent_executor.run(prompt, callbacks=[st_callback])
+        response = st.session_state.agent_executor.invoke({"input": prompt}, {"callbacks": [st_callback]})["output"]
         st.markdown(response)
     
     st.session_state.messages.append({"role": "assistant", "content": response})
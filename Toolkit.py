@@ -1,16 +1,299 @@
+import asyncio
+import hashlib
+import json
 import logging
-from typing import List, Optional, Type, Sequence, Dict, Any, Union, Tuple
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, ClassVar, Iterator, List, Optional, Set, Type, Sequence, Dict, Any, Union, Tuple
+from cachetools import TTLCache
 from langchain_core.language_models import BaseLanguageModel
 from langchain_core.pydantic_v1 import Field, BaseModel
 from langchain_core.tools import BaseToolkit
 from langchain_community.tools import BaseTool
-from langchain_core.callbacks import CallbackManagerForToolRun
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
 import pandas as pd
+import requests
+import sqlglot
+from snowflake.connector.errors import NotSupportedError
+from snowflake.connector.result_batch import ArrowResultBatch
+from sqlglot import exp
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@contextmanager
+def pooled_connection(pool: Any) -> Iterator[Any]:
+    """Check a connection out of the pool for the duration of the block."""
+    conn = pool.connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+# Per event loop and pool, bounds concurrent checkouts to the pool size.
+_pool_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[int, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+@asynccontextmanager
+async def apooled_connection(pool: Any) -> AsyncIterator[Any]:
+    """Check a connection out of the pool without blocking the event loop."""
+    # Coroutines beyond the pool size wait on the semaphore rather than inside pool.connect,
+    # where they would block the loop and starve the coroutines holding connections.
+    semaphores = _pool_semaphores.setdefault(asyncio.get_running_loop(), {})
+    semaphore = semaphores.setdefault(id(pool), asyncio.Semaphore(pool.size()))
+    async with semaphore:
+        conn = await asyncio.to_thread(pool.connect)
+        try:
+            yield conn
+        finally:
+            await asyncio.to_thread(conn.close)
+
+def _fetch_df(cursor: Any) -> pd.DataFrame:
+    """Materialize the cursor's result through the connector's Arrow fast path."""
+    try:
+        return cursor.fetch_pandas_all()
+    except NotSupportedError:
+        # Metadata commands such as DESCRIBE and SHOW return JSON rather than Arrow results.
+        return pd.DataFrame(cursor.fetchall(), columns=[c[0] for c in cursor.description])
+
+def run_df(conn: Any, sql: str, params: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+    """Execute the query on a fresh cursor and return its result as a DataFrame."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        return _fetch_df(cursor)
+    finally:
+        cursor.close()
+
+# Seconds between status polls of an asynchronously executed query.
+ASYNC_POLL_INTERVAL = 0.05
+
+async def _execute_async(conn: Any, cursor: Any, sql: str, params: Optional[Sequence[Any]] = None) -> str:
+    """Submit the query asynchronously, yield to the event loop until it finishes, and load its results."""
+    await asyncio.to_thread(cursor.execute_async, sql, params)
+    query_id = cursor.sfqid
+    while conn.is_still_running(
+        await asyncio.to_thread(conn.get_query_status_throw_if_error, query_id)
+    ):
+        await asyncio.sleep(ASYNC_POLL_INTERVAL)
+    await asyncio.to_thread(cursor.get_results_from_sfqid, query_id)
+    return query_id
+
+async def arun_df(conn: Any, sql: str, params: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+    """Asynchronous counterpart of `run_df`."""
+    cursor = conn.cursor()
+    try:
+        await _execute_async(conn, cursor, sql, params)
+        return await asyncio.to_thread(_fetch_df, cursor)
+    finally:
+        cursor.close()
+
+# Model used for every Cortex completion.
+CORTEX_MODEL = "snowflake-arctic"
+# Maximum number of Cortex completions kept in the in-process cache.
+CORTEX_CACHE_SIZE = 1024
+
+# Parameters are bound server-side (the connections use the qmark paramstyle), so every prompt
+# reuses one statement text.
+CORTEX_COMPLETE_QUERY = "SELECT SNOWFLAKE.CORTEX.COMPLETE(?, ?)"
+# Cortex REST endpoint used for streamed completions.
+CORTEX_STREAM_URL = "https://{host}/api/v2/cortex/inference:complete"
+# Seconds to wait for the streamed completion to start or make progress.
+CORTEX_STREAM_TIMEOUT = 300
+
+_cortex_cache: "OrderedDict[str, str]" = OrderedDict()
+_cortex_cache_lock = threading.Lock()
+
+def _cortex_cache_key(prompt: str) -> str:
+    return hashlib.blake2b(f"{CORTEX_MODEL}\0{prompt}".encode(), digest_size=16).hexdigest()
+
+def _cortex_cache_get(key: str) -> Optional[str]:
+    with _cortex_cache_lock:
+        if key not in _cortex_cache:
+            return None
+        _cortex_cache.move_to_end(key)
+        logger.info("Cortex cache hit: %s", key)
+        return _cortex_cache[key]
+
+def _cortex_cache_put(key: str, completion: str) -> None:
+    with _cortex_cache_lock:
+        _cortex_cache[key] = completion
+        _cortex_cache.move_to_end(key)
+        if len(_cortex_cache) > CORTEX_CACHE_SIZE:
+            _cortex_cache.popitem(last=False)
+
+def cortex_complete(pool: Any, prompt: str) -> str:
+    """Complete the prompt with Snowflake Cortex, serving repeated prompts from an LRU cache."""
+    key = _cortex_cache_key(prompt)
+    cached = _cortex_cache_get(key)
+    if cached is not None:
+        return cached
+
+    logger.info("Executing Cortex query for prompt: %s", prompt)
+    with pooled_connection(pool) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(CORTEX_COMPLETE_QUERY, (CORTEX_MODEL, prompt))
+            completion = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+    logger.info("Cortex inference result: %s", completion)
+    _cortex_cache_put(key, completion)
+    return completion
+
+async def acortex_complete(pool: Any, prompt: str) -> str:
+    """Asynchronous counterpart of `cortex_complete`."""
+    key = _cortex_cache_key(prompt)
+    cached = _cortex_cache_get(key)
+    if cached is not None:
+        return cached
+
+    logger.info("Executing Cortex query for prompt: %s", prompt)
+    async with apooled_connection(pool) as conn:
+        cursor = conn.cursor()
+        try:
+            await _execute_async(conn, cursor, CORTEX_COMPLETE_QUERY, (CORTEX_MODEL, prompt))
+            (completion,) = await asyncio.to_thread(cursor.fetchone)
+        finally:
+            cursor.close()
+    logger.info("Cortex inference result: %s", completion)
+    _cortex_cache_put(key, completion)
+    return completion
+
+class CortexStreamError(Exception):
+    """Raised when a Cortex stream fails after part of the completion was already yielded."""
+
+def _stream_deltas(response: requests.Response) -> Iterator[str]:
+    """Yield the text deltas of a Cortex SSE response, raising `CortexStreamError` on error events."""
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            event = None
+            continue
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+            continue
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        if event == "error":
+            raise CortexStreamError(f"Cortex stream error: {data}")
+        try:
+            payload = json.loads(data)
+        except ValueError as e:
+            raise CortexStreamError(f"Malformed Cortex stream event: {data}") from e
+        is_error = isinstance(payload, dict) and "choices" not in payload and (
+            "error" in payload or "message" in payload
+        )
+        if not isinstance(payload, dict) or is_error:
+            raise CortexStreamError(f"Cortex stream error: {data}")
+        choices = payload.get("choices") or [{}]
+        text = choices[0].get("delta", {}).get("content")
+        if text:
+            yield text
+
+def cortex_stream(pool: Any, prompt: str) -> Iterator[str]:
+    """Stream a Cortex completion as it is generated, falling back to `cortex_complete`."""
+    key = _cortex_cache_key(prompt)
+    cached = _cortex_cache_get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    with pooled_connection(pool) as conn:
+        host, token = conn.host, conn.rest.token
+    logger.info("Streaming Cortex completion for prompt: %s", prompt)
+    try:
+        response = requests.post(
+            CORTEX_STREAM_URL.format(host=host),
+            headers={
+                "Authorization": f'Snowflake Token="{token}"',
+                "Content-Type": "application/json",
+                "Accept": "text/event-stream",
+            },
+            json={"model": CORTEX_MODEL, "messages": [{"content": prompt}], "stream": True},
+            stream=True,
+            timeout=CORTEX_STREAM_TIMEOUT,
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.info("Cortex streaming unavailable, falling back to COMPLETE: %s", e)
+        yield cortex_complete(pool, prompt)
+        return
+
+    parts = []
+    try:
+        with response:
+            for text in _stream_deltas(response):
+                parts.append(text)
+                yield text
+    except (requests.RequestException, CortexStreamError) as e:
+        if parts:
+            # Part of the completion was already handed out; the caller has to restart it.
+            logger.warning("Cortex stream failed after %s chunks: %s", len(parts), e)
+            raise CortexStreamError(str(e)) from e
+        logger.info("Cortex stream failed, falling back to COMPLETE: %s", e)
+        yield cortex_complete(pool, prompt)
+        return
+    if not parts:
+        logger.info("Cortex stream was empty, falling back to COMPLETE")
+        yield cortex_complete(pool, prompt)
+        return
+
+    completion = "".join(parts)
+    logger.info("Cortex inference result: %s", completion)
+    _cortex_cache_put(key, completion)
+
+# Upper bound on the number of DESCRIBE TABLE statements run concurrently.
+MAX_DESCRIBE_WORKERS = 8
+# Number of table schemas cached, and for how many seconds, to absorb schema drift.
+SCHEMA_CACHE_SIZE = 256
+SCHEMA_CACHE_TTL = 3600
+
+def _split_identifier(identifier: str) -> List[str]:
+    """Split a dotted identifier into its parts, normalized the way Snowflake resolves them."""
+    return [
+        part[1:-1] if part.startswith('"') and part.endswith('"') else part.upper()
+        for part in (p.strip() for p in identifier.split("."))
+    ]
+
+def _group_by_database(tables: List[str]) -> Dict[str, List[str]]:
+    """Group the fully-qualified tables by database; other tables are left out."""
+    by_database: Dict[str, List[str]] = {}
+    for t in tables:
+        parts = _split_identifier(t)
+        if len(parts) == 3:
+            by_database.setdefault(parts[0], []).append(t)
+    return by_database
+
+def _columns_query(database: str, tables: List[str]) -> Tuple[str, List[str], Dict[str, List[str]]]:
+    """Build the INFORMATION_SCHEMA.COLUMNS query for fully-qualified tables of one database."""
+    names = {t: _split_identifier(t) for t in tables}
+    pairs = ", ".join(["(?, ?)"] * len(names))
+    params = [part for (_, schema, name) in names.values() for part in (schema, name)]
+    query = (
+        "SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, DATA_TYPE, IS_NULLABLE "
+        f'FROM "{database}".INFORMATION_SCHEMA.COLUMNS '
+        f"WHERE (TABLE_SCHEMA, TABLE_NAME) IN ({pairs}) "
+        "ORDER BY TABLE_SCHEMA, TABLE_NAME, ORDINAL_POSITION"
+    )
+    return query, params, names
+
+def _group_columns(columns: pd.DataFrame, names: Dict[str, List[str]]) -> Dict[str, pd.DataFrame]:
+    """Split INFORMATION_SCHEMA.COLUMNS rows into one frame per requested table."""
+    groups = {
+        key: group.drop(columns=["TABLE_SCHEMA", "TABLE_NAME"]).reset_index(drop=True)
+        for key, group in columns.groupby(["TABLE_SCHEMA", "TABLE_NAME"])
+    }
+    # Tables absent from INFORMATION_SCHEMA are left to DESCRIBE, which reports the error.
+    return {t: groups[(schema, name)] for t, (_, schema, name) in names.items() if (schema, name) in groups}
+
 class _InfoSQLDatabaseToolInput(BaseModel):
     table_names: str = Field(
         ...,
@@ -27,7 +310,11 @@ class InfoSnowflakeTableTool(BaseTool):
     description: str = "Get the schema and sample rows for the specified SQL tables."
     args_schema: Type[BaseModel] = _InfoSQLDatabaseToolInput
 
-    conn: Any = Field(exclude=True)
+    pool: Any = Field(exclude=True)
+
+    # Formatted schemas keyed on (pool, normalized table name), shared by every tool instance.
+    _schema_cache: ClassVar[TTLCache] = TTLCache(maxsize=SCHEMA_CACHE_SIZE, ttl=SCHEMA_CACHE_TTL)
+    _schema_cache_lock: ClassVar[threading.Lock] = threading.Lock()
 
     def _run(
         self,
@@ -35,16 +322,116 @@ class InfoSnowflakeTableTool(BaseTool):
         run_manager: Optional[CallbackManagerForToolRun] = None,
     ) -> str:
         """Get the schema for tables in a comma-separated list."""
-        logger.info(f"Getting schema for tables: {table_names}")
-        output_schema = ""
-        _table_names = table_names.split(",")
-        for t in _table_names:
-            query = f"DESCRIBE TABLE {t}"
-            logger.info(f"Executing query: {query}")
-            schema = pd.read_sql(query, self.conn)
-            logger.info(f"Schema for table {t}:\n{schema.to_string()}")
-            output_schema += f"Schema for table {t}:\n{schema.to_string()}\n\n"
-        return output_schema
+        logger.info("Getting schema for tables: %s", table_names)
+        _table_names = [t.strip() for t in table_names.split(",") if t.strip()]
+        schemas = self._cached_schemas(_table_names)
+        misses = [t for t in _table_names if t not in schemas]
+        if misses:
+            logger.info("Schema cache misses: %s", misses)
+            schemas.update(self._cache_schemas(self._fetch_schemas(misses)))
+        return self._format_output(_table_names, schemas)
+
+    async def _arun(
+        self,
+        table_names: str,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> str:
+        """Get the schema for tables, describing cache misses without blocking the event loop."""
+        logger.info("Getting schema for tables: %s", table_names)
+        _table_names = [t.strip() for t in table_names.split(",") if t.strip()]
+        schemas = self._cached_schemas(_table_names)
+        misses = [t for t in _table_names if t not in schemas]
+        if misses:
+            logger.info("Schema cache misses: %s", misses)
+            schemas.update(self._cache_schemas(await self._afetch_schemas(misses)))
+        return self._format_output(_table_names, schemas)
+
+    def _cache_key(self, table: str) -> Tuple[int, str]:
+        return id(self.pool), ".".join(_split_identifier(table))
+
+    def _cached_schemas(self, tables: List[str]) -> Dict[str, str]:
+        with self._schema_cache_lock:
+            return {
+                t: self._schema_cache[self._cache_key(t)]
+                for t in tables
+                if self._cache_key(t) in self._schema_cache
+            }
+
+    def _cache_schemas(self, schemas: Dict[str, str]) -> Dict[str, str]:
+        with self._schema_cache_lock:
+            for t, schema in schemas.items():
+                self._schema_cache[self._cache_key(t)] = schema
+        return schemas
+
+    @staticmethod
+    def _format_output(tables: List[str], schemas: Dict[str, str]) -> str:
+        return "\n\n".join(f"Schema for table {t}:\n{schemas[t]}" for t in tables)
+
+    @staticmethod
+    def _format_schemas(tables: List[str], schemas: Dict[str, pd.DataFrame]) -> Dict[str, str]:
+        formatted = {}
+        for t in tables:
+            formatted[t] = schemas[t].to_csv(sep="|", index=False)
+            logger.debug("Schema for table %s:\n%s", t, formatted[t])
+        return formatted
+
+    def _fetch_schemas(self, tables: List[str]) -> Dict[str, str]:
+        """Describe the tables, batching the fully-qualified ones per database."""
+        schemas: Dict[str, pd.DataFrame] = {}
+        for database, qualified in _group_by_database(tables).items():
+            schemas.update(self._describe_qualified(database, qualified))
+        missing = [t for t in tables if t not in schemas]
+        if missing:
+            schemas.update(self._describe(missing))
+        return self._format_schemas(tables, schemas)
+
+    async def _afetch_schemas(self, tables: List[str]) -> Dict[str, str]:
+        """Describe the tables concurrently, batching the fully-qualified ones per database."""
+        schemas: Dict[str, pd.DataFrame] = {}
+        described = await asyncio.gather(
+            *(self._adescribe_qualified(database, qualified)
+              for database, qualified in _group_by_database(tables).items())
+        )
+        for columns in described:
+            schemas.update(columns)
+        missing = [t for t in tables if t not in schemas]
+        if missing:
+            schemas.update(zip(missing, await asyncio.gather(*(self._adescribe(t) for t in missing))))
+        return self._format_schemas(tables, schemas)
+
+    def _describe_qualified(self, database: str, tables: List[str]) -> Dict[str, pd.DataFrame]:
+        """Get the columns of fully-qualified tables of one database in a single round-trip."""
+        query, params, names = _columns_query(database, tables)
+        logger.info("Executing query: %s", query)
+        with pooled_connection(self.pool) as conn:
+            columns = run_df(conn, query, params)
+        return _group_columns(columns, names)
+
+    async def _adescribe_qualified(self, database: str, tables: List[str]) -> Dict[str, pd.DataFrame]:
+        """Asynchronous counterpart of `_describe_qualified`."""
+        query, params, names = _columns_query(database, tables)
+        logger.info("Executing query: %s", query)
+        async with apooled_connection(self.pool) as conn:
+            columns = await arun_df(conn, query, params)
+        return _group_columns(columns, names)
+
+    def _describe(self, tables: List[str]) -> Dict[str, pd.DataFrame]:
+        """Run DESCRIBE TABLE for each table concurrently, each on its own pooled connection."""
+        def describe(table: str) -> pd.DataFrame:
+            query = f"DESCRIBE TABLE {table}"
+            logger.info("Executing query: %s", query)
+            with pooled_connection(self.pool) as conn:
+                return run_df(conn, query)
+
+        with ThreadPoolExecutor(max_workers=MAX_DESCRIBE_WORKERS) as executor:
+            return dict(zip(tables, executor.map(describe, tables)))
+
+    async def _adescribe(self, table: str) -> pd.DataFrame:
+        """Run DESCRIBE TABLE without blocking the event loop."""
+        query = f"DESCRIBE TABLE {table}"
+        logger.info("Executing query: %s", query)
+        async with apooled_connection(self.pool) as conn:
+            return await arun_df(conn, query)
 
 class _QuerySQLCheckerToolInput(BaseModel):
     query: str = Field(..., description="A detailed and SQL query to be checked.")
@@ -76,7 +463,7 @@ class QuerySQLCheckerTool(BaseTool):
     """
     args_schema: Type[BaseModel] = _QuerySQLCheckerToolInput
 
-    conn: Any = Field(exclude=True)
+    pool: Any = Field(exclude=True)
 
     def _run(
         self,
@@ -84,16 +471,157 @@ class QuerySQLCheckerTool(BaseTool):
         run_manager: Optional[CallbackManagerForToolRun] = None,
     ) -> str:
         """Use the Snowflake Cortex to check the query."""
-        logger.info(f"Checking query: {query}")
-        escaped_query = query.replace('"', '\\"').replace("'", "\\'")
-        prompt = self.template.format(query=escaped_query, dialect="Snowflake")
-        cortex_query = f"SELECT SNOWFLAKE.CORTEX.COMPLETE('snowflake-arctic', '{prompt}');"
-        logger.info(f"Executing Cortex query: {cortex_query}")
-        result = pd.read_sql(cortex_query, self.conn)
-        checked_query = result.iloc[0, 0]
-        logger.info(f"Checked query result: {checked_query}")
+        logger.info("Checking query: %s", query)
+        prompt = self.template.format(query=query, dialect="Snowflake")
+        checked_query = cortex_complete(self.pool, prompt)
+        logger.info("Checked query result: %s", checked_query)
+        return checked_query
+
+    async def _arun(
+        self,
+        query: str,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> str:
+        """Use the Snowflake Cortex to check the query without blocking the event loop."""
+        logger.info("Checking query: %s", query)
+        prompt = self.template.format(query=query, dialect="Snowflake")
+        checked_query = await acortex_complete(self.pool, prompt)
+        logger.info("Checked query result: %s", checked_query)
         return checked_query
 
+# Look-back window and row cap pushed down into unbounded QUERY_HISTORY scans.
+QUERY_HISTORY_DAYS = 7
+QUERY_HISTORY_LIMIT = 20
+# Rows of a query result shown to the agent.
+RESULT_DISPLAY_ROWS = 100
+
+class LazyResult:
+    """Result of a query that only downloads the result batches it needs."""
+
+    def __init__(
+        self,
+        query_id: str,
+        batches: Optional[List[ArrowResultBatch]] = None,
+        frame: Optional[pd.DataFrame] = None,
+        columns: Optional[List[str]] = None,
+    ):
+        self.query_id = query_id
+        self._batches = batches or []
+        self._frame = frame
+        # Column names of the result, used for the empty frame of a result without rows.
+        self._columns = columns or []
+        # Shown to the agent above the rows, e.g. when the executed SQL differs from the requested one.
+        self.note: Optional[str] = None
+        self._fetched: List[pd.DataFrame] = []
+
+    @classmethod
+    def from_cursor(cls, cursor: Any, query_id: str) -> "LazyResult":
+        """Wrap the cursor's result batches; results that are not Arrow are read eagerly."""
+        batches = cursor.get_result_batches() or []
+        if all(isinstance(batch, ArrowResultBatch) for batch in batches):
+            return cls(query_id, batches=batches, columns=[c[0] for c in cursor.description or []])
+        return cls(query_id, frame=_fetch_df(cursor))
+
+    @property
+    def rowcount(self) -> int:
+        if self._frame is not None:
+            return len(self._frame)
+        return sum(batch.rowcount for batch in self._batches)
+
+    def to_pandas(self, limit: int = RESULT_DISPLAY_ROWS) -> pd.DataFrame:
+        """Return the first `limit` rows, downloading only as many batches as that takes."""
+        if self._frame is not None:
+            return self._frame.head(limit)
+        rows = sum(len(frame) for frame in self._fetched)
+        for batch in self._batches[len(self._fetched):]:
+            if rows >= limit:
+                break
+            self._fetched.append(batch.to_pandas())
+            rows += len(self._fetched[-1])
+        if not self._fetched:
+            return pd.DataFrame(columns=self._columns)
+        return pd.concat(self._fetched, ignore_index=True).head(limit)
+
+    def materialize(self) -> pd.DataFrame:
+        """Download the batches not fetched yet and return the full result."""
+        if self._frame is None:
+            frames = self._fetched + [batch.to_pandas() for batch in self._batches[len(self._fetched):]]
+            self._frame = (
+                pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=self._columns)
+            )
+        return self._frame
+
+    def __str__(self) -> str:
+        head = self.to_pandas()
+        return (
+            (f"{self.note}\n" if self.note else "")
+            + f"query_id: {self.query_id}\n"
+            + f"First {len(head)} of {self.rowcount} rows:\n{head.to_string()}"
+        )
+
+def _run_lazy(pool: Any, sql: str, params: Optional[Sequence[Any]] = None) -> Union[str, LazyResult]:
+    """Execute the query on a pooled connection, return the lazily fetched results; or an error message."""
+    try:
+        with pooled_connection(pool) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params)
+                results = LazyResult.from_cursor(cursor, cursor.sfqid)
+            finally:
+                cursor.close()
+        logger.info("Query %s returned %s rows", results.query_id, results.rowcount)
+        logger.debug("Query results:\n%s", results)
+        return results
+    except Exception as e:
+        error_msg = f"Error: {e}"
+        logger.error(error_msg)
+        return error_msg
+
+async def _arun_lazy(pool: Any, sql: str, params: Optional[Sequence[Any]] = None) -> Union[str, LazyResult]:
+    """Asynchronous counterpart of `_run_lazy`."""
+    try:
+        async with apooled_connection(pool) as conn:
+            cursor = conn.cursor()
+            try:
+                query_id = await _execute_async(conn, cursor, sql, params)
+                results = await asyncio.to_thread(LazyResult.from_cursor, cursor, query_id)
+            finally:
+                cursor.close()
+        logger.info("Query %s returned %s rows", results.query_id, results.rowcount)
+        logger.debug("Query results:\n%s", results)
+        return results
+    except Exception as e:
+        error_msg = f"Error: {e}"
+        logger.error(error_msg)
+        return error_msg
+
+def _push_down_query_history(query: str) -> str:
+    """Bound a QUERY_HISTORY scan by START_TIME and row count if the query does not already."""
+    try:
+        tree = sqlglot.parse_one(query, read="snowflake")
+    except sqlglot.errors.SqlglotError:
+        return query
+    if not isinstance(tree, exp.Select):
+        return query
+    # sqlglot 28 renamed the FROM clause key from "from" to "from_".
+    from_ = tree.args.get("from_") or tree.args.get("from")
+    table = from_.this if from_ else None
+    if not (isinstance(table, exp.Table) and table.name.upper() == "QUERY_HISTORY"):
+        return query
+
+    bounded = False
+    where = tree.args.get("where")
+    if not (where and any(c.name.upper() == "START_TIME" for c in where.find_all(exp.Column))):
+        tree = tree.where(
+            f"{table.alias_or_name}.START_TIME >= DATEADD(day, -{QUERY_HISTORY_DAYS}, CURRENT_TIMESTAMP())",
+            dialect="snowflake",
+        )
+        bounded = True
+    if not (tree.args.get("limit") or tree.args.get("fetch")):
+        tree = tree.limit(QUERY_HISTORY_LIMIT)
+        bounded = True
+    return tree.sql(dialect="snowflake") if bounded else query
+
 class _QuerySQLDataBaseToolInput(BaseModel):
     query: str = Field(..., description="A detailed and correct SQL query.")
 
@@ -108,33 +636,305 @@ class QuerySQLDataBaseTool(BaseTool):
     """
     args_schema: Type[BaseModel] = _QuerySQLDataBaseToolInput
 
-    conn: Any = Field(exclude=True)
+    pool: Any = Field(exclude=True)
 
     def _run(
         self,
         query: str,
         run_manager: Optional[CallbackManagerForToolRun] = None,
-    ) -> Tuple[Union[str, pd.DataFrame], Optional[str]]:
-        """Execute the query, return the results and query_id; or an error message."""
-        logger.info(f"Executing query: {query}")
+    ) -> Union[str, LazyResult]:
+        """Execute the query, return the lazily fetched results and query_id; or an error message."""
+        logger.info("Executing query: %s", query)
+        bounded = _push_down_query_history(query)
+        return self._annotate(_run_lazy(self.pool, bounded), query, bounded)
+
+    async def _arun(
+        self,
+        query: str,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Union[str, LazyResult]:
+        """Execute the query without blocking the event loop."""
+        logger.info("Executing query: %s", query)
+        bounded = _push_down_query_history(query)
+        return self._annotate(await _arun_lazy(self.pool, bounded), query, bounded)
+
+    @staticmethod
+    def _annotate(result: Union[str, LazyResult], query: str, executed: str) -> Union[str, LazyResult]:
+        """Tell the agent which SQL actually ran when its QUERY_HISTORY scan was bounded."""
+        if executed == query:
+            return result
+        logger.info("Bounded QUERY_HISTORY scan: %s", executed)
+        note = (
+            f"Note: the QUERY_HISTORY scan was bounded to the last {QUERY_HISTORY_DAYS} days and "
+            f"at most {QUERY_HISTORY_LIMIT} rows where the query did not bound it. Executed SQL: {executed}"
+        )
+        if isinstance(result, LazyResult):
+            result.note = note
+            return result
+        return f"{note}\n{result}"
+
+# QUERY_HISTORY columns the expensive queries may be ranked by, keyed by metric name.
+EXPENSIVE_QUERY_METRICS = {
+    "execution_time": "EXECUTION_TIME",
+    "elapsed_time": "TOTAL_ELAPSED_TIME",
+    "bytes_scanned": "BYTES_SCANNED",
+}
+# Only the whitelisted ORDER BY column is formatted in; the window and row count are bound
+# server-side as parameters.
+EXPENSIVE_QUERIES_QUERY = """
+SELECT QUERY_ID, QUERY_TEXT, TOTAL_ELAPSED_TIME, EXECUTION_TIME, BYTES_SCANNED
+FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY
+WHERE START_TIME >= DATEADD(day, -?, CURRENT_TIMESTAMP())
+AND QUERY_TYPE = 'SELECT'
+AND EXECUTION_STATUS = 'SUCCESS'
+ORDER BY {metric} DESC
+LIMIT ?
+"""
+
+class _ExpensiveQueriesToolInput(BaseModel):
+    days: int = Field(QUERY_HISTORY_DAYS, ge=1, description="Number of days to look back.")
+    top: int = Field(QUERY_HISTORY_LIMIT, ge=1, description="Number of queries to return.")
+    metric: str = Field(
+        "execution_time",
+        description=f"Metric to rank the queries by, one of: {', '.join(EXPENSIVE_QUERY_METRICS)}.",
+    )
+
+class ExpensiveQueriesTool(BaseTool):
+    """Tool for finding the most expensive SELECT queries in QUERY_HISTORY."""
+
+    name: str = "find_expensive_queries"
+    description: str = """
+    Find the most expensive successful SELECT queries of the last days, ranked by a metric.
+    """
+    args_schema: Type[BaseModel] = _ExpensiveQueriesToolInput
+
+    pool: Any = Field(exclude=True)
+
+    def _query(self, metric: str) -> Optional[str]:
+        column = EXPENSIVE_QUERY_METRICS.get(metric.strip().lower())
+        return EXPENSIVE_QUERIES_QUERY.format(metric=column) if column else None
+
+    def _run(
+        self,
+        days: int = QUERY_HISTORY_DAYS,
+        top: int = QUERY_HISTORY_LIMIT,
+        metric: str = "execution_time",
+        run_manager: Optional[CallbackManagerForToolRun] = None,
+    ) -> Union[str, LazyResult]:
+        """Run the pre-vetted top-N query, return the lazily fetched results; or an error message."""
+        logger.info("Finding top %s queries of the last %s days by %s", top, days, metric)
+        query = self._query(metric)
+        if query is None:
+            return self._unknown_metric(metric)
+        return _run_lazy(self.pool, query, (int(days), int(top)))
+
+    async def _arun(
+        self,
+        days: int = QUERY_HISTORY_DAYS,
+        top: int = QUERY_HISTORY_LIMIT,
+        metric: str = "execution_time",
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Union[str, LazyResult]:
+        """Run the pre-vetted top-N query without blocking the event loop."""
+        logger.info("Finding top %s queries of the last %s days by %s", top, days, metric)
+        query = self._query(metric)
+        if query is None:
+            return self._unknown_metric(metric)
+        return await _arun_lazy(self.pool, query, (int(days), int(top)))
+
+    @staticmethod
+    def _unknown_metric(metric: str) -> str:
+        return f"Error: unknown metric {metric}, use one of: {', '.join(EXPENSIVE_QUERY_METRICS)}"
+
+# Matches `$<id>` references to the output of an earlier plan step.
+_STEP_REF_RE = re.compile(r"\$(\d+)")
+# Matches table references in query text, e.g. `FROM db.schema.table` or `JOIN table`.
+_TABLE_REF_RE = re.compile(
+    r"\b(?:FROM|JOIN)\s+([A-Za-z_][\w$]*(?:\.[A-Za-z_][\w$]*){0,2})", re.IGNORECASE
+)
+# Upper bound on the number of schemas fetched speculatively per plan.
+MAX_SPECULATIVE_SCHEMAS = 20
+
+class _ParallelPlanToolInput(BaseModel):
+    plan: Union[str, List[Dict[str, Any]]] = Field(
+        ...,
+        description=(
+            "A list (or JSON-encoded list) of tool calls, each of the form "
+            '{"id": 1, "tool": "sql_db_schema", "args": {"table_names": "table1"}, "deps": []}. '
+            "`deps` lists the ids of the calls that must finish first, and `$<id>` inside "
+            "an argument is replaced by the output of that call."
+        ),
+    )
+
+def _parse_plan(plan: Union[str, List[Dict[str, Any]]]) -> Union[str, Dict[int, Dict[str, Any]]]:
+    """Validate the plan and key its steps by id; or return an error message."""
+    try:
+        steps = json.loads(plan) if isinstance(plan, str) else plan
+    except ValueError as e:
+        return f"Error: the plan is not a valid JSON list of tool calls: {e}"
+    if not isinstance(steps, list):
+        return "Error: the plan must be a list of tool calls"
+    nodes: Dict[int, Dict[str, Any]] = {}
+    for step in steps:
+        if not isinstance(step, dict):
+            return f"Error: plan step {step!r} is not an object"
+        node_id, args, deps = step.get("id"), step.get("args", {}), step.get("deps", [])
+        if not isinstance(node_id, int) or isinstance(node_id, bool):
+            return f"Error: plan step {step!r} needs an integer id"
+        if node_id in nodes:
+            return f"Error: duplicate plan step id {node_id}"
+        if not isinstance(step.get("tool"), str):
+            return f"Error: plan step {node_id} needs a tool name"
+        if not isinstance(args, dict):
+            return f"Error: the args of plan step {node_id} must be an object"
+        if not isinstance(deps, list) or not all(
+            isinstance(d, int) and not isinstance(d, bool) for d in deps
+        ):
+            return f"Error: the deps of plan step {node_id} must be a list of step ids"
+        nodes[node_id] = {**step, "args": args, "deps": deps}
+    return nodes
+
+class ParallelPlanTool(BaseTool):
+    """Executes a plan of tool calls as a DAG, running independent calls concurrently."""
+
+    name: str = "sql_parallel_plan"
+    description: str = """
+    Run several tool calls at once. Independent calls are executed concurrently and
+    the output of every call is returned. Schemas of the tables referenced by
+    QUERY_TEXT in any query result are fetched speculatively.
+    """
+    args_schema: Type[BaseModel] = _ParallelPlanToolInput
+
+    tools: List[BaseTool] = Field(exclude=True)
+
+    def _run(
+        self,
+        plan: Union[str, List[Dict[str, Any]]],
+        run_manager: Optional[CallbackManagerForToolRun] = None,
+    ) -> str:
+        """Execute the plan on a fresh event loop."""
+        return asyncio.run(self._arun(plan))
+
+    async def _arun(
+        self,
+        plan: Union[str, List[Dict[str, Any]]],
+        run_manager: Optional[Union[AsyncCallbackManagerForToolRun, CallbackManagerForToolRun]] = None,
+    ) -> str:
+        """Dispatch every call whose dependencies are resolved, until the plan is drained."""
+        logger.info("Executing plan: %s", plan)
+        nodes = _parse_plan(plan)
+        if isinstance(nodes, str):
+            return nodes
+
+        # The child calls run without callbacks: UI handlers such as Streamlit's follow one tool
+        # at a time and cannot track concurrent calls. Their results are rendered in the output.
+        tools = {tool.name: tool for tool in self.tools}
+        # Tables the plan asks for explicitly are never fetched speculatively as well.
+        requested = {
+            t.strip().upper()
+            for node in nodes.values()
+            if isinstance(tools.get(node.get("tool")), InfoSnowflakeTableTool)
+            for t in str(node["args"].get("table_names", "")).split(",")
+        }
+        schema_tasks: Dict[str, asyncio.Task] = {}
+        results: Dict[int, Any] = {}
+        pending = set(nodes)
+        running: Dict[asyncio.Task, int] = {}
+        speculations: List[asyncio.Task] = []
+
+        while pending or running:
+            ready = [i for i in pending if all(d in results for d in nodes[i]["deps"])]
+            for node_id in ready:
+                pending.discard(node_id)
+                task = asyncio.create_task(
+                    self._dispatch(nodes[node_id], tools, results)
+                )
+                running[task] = node_id
+            if not running:
+                for node_id in pending:
+                    results[node_id] = f"Error: unresolved dependencies {nodes[node_id]['deps']}"
+                break
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                node_id = running.pop(task)
+                results[node_id] = task.result()
+                logger.info("Plan step %s complete", node_id)
+                speculations.append(asyncio.create_task(
+                    self._speculate(results[node_id], tools, requested, schema_tasks)
+                ))
+        await asyncio.gather(*speculations)
+
+        # Rendering a LazyResult downloads its first batches, so keep it off the event loop.
+        output = await asyncio.to_thread(lambda: [
+            f"Result of step {node_id} ({nodes[node_id].get('tool')}):\n{results[node_id]}"
+            for node_id in sorted(results)
+        ])
+        if schema_tasks:
+            prefetched = await asyncio.gather(*schema_tasks.values())
+            output.append("Prefetched schemas:\n" + "\n\n".join(prefetched))
+        return "\n\n".join(output)
+
+    async def _dispatch(
+        self,
+        node: Dict[str, Any],
+        tools: Dict[str, BaseTool],
+        results: Dict[int, Any],
+    ) -> Any:
+        """Run a single plan step, substituting `$<id>` references with earlier outputs."""
+        tool = tools.get(node.get("tool"))
+        if tool is None:
+            return f"Error: unknown tool {node.get('tool')}"
+        # Rendering a referenced LazyResult downloads its first batches, so keep it off the event loop.
+        args = await asyncio.to_thread(lambda: {
+            key: _STEP_REF_RE.sub(lambda m: str(results.get(int(m.group(1)), m.group(0))), value)
+            if isinstance(value, str) else value
+            for key, value in node["args"].items()
+        })
         try:
-            results = pd.read_sql(query, self.conn)
-            logger.info(f"Query results:\n{results.to_string()}")
-            cursor = self.conn.cursor()
-            cursor.execute(query)
-            query_id = cursor.sfqid
-            cursor.close()
-            logger.info(f"Query ID: {query_id}")
-            return results, query_id
+            return await tool.arun(args)
         except Exception as e:
             error_msg = f"Error: {e}"
             logger.error(error_msg)
-            return error_msg, None
+            return error_msg
+
+    async def _fetch_schema(self, table: str, tool: BaseTool) -> str:
+        """Fetch the schema for a single table, returning an error message on failure."""
+        try:
+            return await tool.arun({"table_names": table})
+        except Exception as e:
+            error_msg = f"Error getting schema for table {table}: {e}"
+            logger.error(error_msg)
+            return error_msg
+
+    async def _speculate(
+        self,
+        result: Any,
+        tools: Dict[str, BaseTool],
+        requested: Set[str],
+        schema_tasks: Dict[str, asyncio.Task],
+    ) -> None:
+        """Start fetching the schemas of the tables referenced by a query result."""
+        if not isinstance(result, LazyResult):
+            return
+        results = await asyncio.to_thread(result.to_pandas)
+        if "QUERY_TEXT" not in results.columns:
+            return
+        info_tool = next((t for t in tools.values() if isinstance(t, InfoSnowflakeTableTool)), None)
+        if info_tool is None:
+            return
+        for query_text in results["QUERY_TEXT"].dropna():
+            for table in _TABLE_REF_RE.findall(query_text):
+                key = table.upper()
+                if key in requested or key in schema_tasks:
+                    continue
+                if len(schema_tasks) >= MAX_SPECULATIVE_SCHEMAS:
+                    return
+                schema_tasks[key] = asyncio.create_task(self._fetch_schema(table, info_tool))
 
 class AgentToolkit(BaseToolkit):
     """Toolkit for interacting with SQL databases."""
 
-    conn: Any = Field(exclude=True)
+    pool: Any = Field(exclude=True)
     llm: BaseLanguageModel = Field(exclude=True)
 
     @property
@@ -155,18 +955,23 @@ class AgentToolkit(BaseToolkit):
             "Example Input: table1, table2, table3"
         )
         info_sql_database_tool = InfoSnowflakeTableTool(
-            conn=self.conn, description=info_sql_database_tool_description
+            pool=self.pool,
+            description=info_sql_database_tool_description,
+            handle_validation_error=True,
         )
         query_sql_database_tool_description = (
-            "Input to this tool is a detailed and correct SQL query, output is a "
-            "result and query_id from the database. If the query is not correct, an error message "
+            "Input to this tool is a detailed and correct SQL query, output is the "
+            f"query_id, the row count and the first {RESULT_DISPLAY_ROWS} rows of the result "
+            "from the database. If the query is not correct, an error message "
             "will be returned. If an error is returned, rewrite the query, check the "
             "query, and try again. If you encounter an issue with Unknown column "
             f"'xxxx' in 'field list', use {info_sql_database_tool.name} "
             "to query the correct table fields."
         )
         query_sql_database_tool = QuerySQLDataBaseTool(
-            conn=self.conn, description=query_sql_database_tool_description
+            pool=self.pool,
+            description=query_sql_database_tool_description,
+            handle_validation_error=True,
         )
         query_sql_checker_tool_description = (
             "Use this tool to double check if your query is correct before executing "
@@ -174,11 +979,47 @@ class AgentToolkit(BaseToolkit):
             f"{query_sql_database_tool.name}!"
         )
         query_sql_checker_tool = QuerySQLCheckerTool(
-            conn=self.conn, description=query_sql_checker_tool_description
+            pool=self.pool,
+            description=query_sql_checker_tool_description,
+            handle_validation_error=True,
+        )
+        expensive_queries_tool_description = (
+            "Input to this tool is the number of days to look back (default "
+            f"{QUERY_HISTORY_DAYS}), the number of queries to return (default "
+            f"{QUERY_HISTORY_LIMIT}) and the metric to rank by, one of "
+            f"{', '.join(EXPENSIVE_QUERY_METRICS)}. Output is the query_id, text, elapsed "
+            "time, execution time and bytes scanned of the most expensive successful "
+            "SELECT queries. Prefer this tool over writing a QUERY_HISTORY query with "
+            f"{query_sql_database_tool.name}."
+        )
+        expensive_queries_tool = ExpensiveQueriesTool(
+            pool=self.pool,
+            description=expensive_queries_tool_description,
+            handle_validation_error=True,
+        )
+        parallel_plan_tool_description = (
+            "Input to this tool is a JSON list of calls to the other tools, each of the form "
+            '{"id": 1, "tool": "<tool name>", "args": {<tool arguments>}, "deps": [<ids>]}. '
+            "Calls without pending dependencies run concurrently, so use this tool whenever "
+            f"several calls (e.g. {info_sql_database_tool.name} for many tables) are independent. "
+            "Output is the result of every call, plus the prefetched schemas of the tables "
+            "referenced by any QUERY_TEXT column in the query results."
+        )
+        parallel_plan_tool = ParallelPlanTool(
+            tools=[
+                query_sql_database_tool,
+                info_sql_database_tool,
+                query_sql_checker_tool,
+                expensive_queries_tool,
+            ],
+            description=parallel_plan_tool_description,
+            handle_validation_error=True,
         )
         logger.info("AgentToolkit tools initialized")
         return [
             query_sql_database_tool,
             info_sql_database_tool,
             query_sql_checker_tool,
+            expensive_queries_tool,
+            parallel_plan_tool,
         ]
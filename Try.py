@@ -1,5 +1,4 @@
 import snowflake.connector
-import pandas as pd
 from typing import Dict, Any, List, Optional
 from langchain.llms.base import LLM
 from langchain.agents import initialize_agent, Tool
@@ -7,22 +6,19 @@ from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 
 # Your existing cortex_inference function
-def cortex_inference(prompt: str) -> str:
-    query = f"SELECT SNOWFLAKE.CORTEX.COMPLETE('snowflake-arctic', '{prompt}');"
-    
-    # Assuming you have a working Snowflake connection
-    con = snowflake.connector.connect(
-        # Connection params
-    )
-    
-    result = pd.read_sql(query, con)
-    con.close()
-    return result.iloc[0, 0]
+def cortex_inference(conn: Any, prompt: str) -> str:
+    cur = conn.cursor()
+    cur.execute("SELECT SNOWFLAKE.CORTEX.COMPLETE(?, ?)", ("snowflake-arctic", prompt))
+    (result,) = cur.fetchone()
+    cur.close()
+    return result
 
 # Custom LLM class for Snowflake Cortex
 class SnowflakeCortexLLM(LLM):
+    conn: Any
+
     def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
-        return cortex_inference(prompt)
+        return cortex_inference(self.conn, prompt)
 
     @property
     def _identifying_params(self) -> Dict[str, Any]:
@@ -32,8 +28,14 @@ class SnowflakeCortexLLM(LLM):
     def _llm_type(self) -> str:
         return "snowflake_cortex"
 
+# Assuming you have a working Snowflake connection, opened once and reused for every call
+con = snowflake.connector.connect(
+    # Connection params
+    paramstyle="qmark",
+)
+
 # Initialize the Snowflake Cortex LLM
-snowflake_llm = SnowflakeCortexLLM()
+snowflake_llm = SnowflakeCortexLLM(conn=con)
 
 # Define a simple tool that the agent can use
 def get_word_length(word: str) -> int:
@@ -70,3 +72,5 @@ print(result)
 # Example of using the LLMChain directly
 chain_result = llm_chain.run("Explain what Python is in one sentence.")
 print(chain_result)
+
+con.close()
@@ -0,0 +1,7 @@
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The modules import each other by their deployed, lowercase names.
+sys.modules.setdefault("toolkit", importlib.import_module("Toolkit"))
@@ -0,0 +1,116 @@
+import pytest
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.exceptions import OutputParserException
+
+import Toolkit
+from Agent import Agent, FastJSONAgentOutputParser, SnowflakeCortexLLM
+from Toolkit import CortexStreamError
+
+
+def _failing_stream(pool, prompt):
+    yield "partial "
+    raise CortexStreamError("connection reset")
+
+
+def test_mid_stream_failure_falls_back_to_complete(monkeypatch):
+    monkeypatch.setattr("Agent.cortex_stream", _failing_stream)
+    monkeypatch.setattr("Agent.cortex_complete", lambda pool, prompt: "full completion")
+    assert SnowflakeCortexLLM(pool=None).invoke("prompt") == "full completion"
+
+
+def test_mid_stream_failure_does_not_abort_the_agent_turn(monkeypatch):
+    monkeypatch.setattr("Agent.cortex_stream", _failing_stream)
+    monkeypatch.setattr(
+        "Agent.cortex_complete",
+        lambda pool, prompt: '{"action": "Final Answer", "action_input": "done"}',
+    )
+    executor = Agent(pool=None).get_executor()
+    assert executor.invoke({"input": "hi"})["output"] == "done"
+
+
+class _FakeConnection:
+    host = "account.snowflakecomputing.com"
+
+    class rest:
+        token = "token"
+
+    def close(self):
+        pass
+
+
+class _FakePool:
+    def connect(self):
+        return _FakeConnection()
+
+
+class _FailingResponse:
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, decode_unicode=False):
+        yield 'data: {"choices": [{"delta": {"content": "partial "}}]}'
+        yield "event: error"
+        yield 'data: {"message": "overloaded"}'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_cortex_stream_raises_after_partial_output(monkeypatch):
+    monkeypatch.setattr(Toolkit.requests, "post", lambda *args, **kwargs: _FailingResponse())
+    chunks = []
+    with pytest.raises(CortexStreamError):
+        for text in Toolkit.cortex_stream(_FakePool(), "uncached prompt"):
+            chunks.append(text)
+    assert chunks == ["partial "]
+    assert Toolkit._cortex_cache_get(Toolkit._cortex_cache_key("uncached prompt")) is None
+
+
+_ACTION = '{"action": "sql_db_query", "action_input": "SELECT 1"}'
+
+
+def test_stream_stops_at_stop_sequence_split_across_chunks(monkeypatch):
+    def stream(pool, prompt):
+        yield from [_ACTION, "\nObserv", "ation: 42 rows", "\nThought: done"]
+
+    monkeypatch.setattr("Agent.cortex_stream", stream)
+    llm = SnowflakeCortexLLM(pool=None)
+    chunks = [chunk.text for chunk in llm._stream("prompt", stop=["\nObservation"])]
+    assert "".join(chunks) == _ACTION
+    assert llm.invoke("prompt", stop=["\nObservation"]) == _ACTION
+
+
+def test_complete_is_truncated_at_stop_sequence(monkeypatch):
+    monkeypatch.setattr("Agent.cortex_complete", lambda pool, prompt: _ACTION + "\nObservation: fake")
+    llm = SnowflakeCortexLLM(pool=None, streaming=False)
+    assert llm.invoke("prompt", stop=["\nObservation"]) == _ACTION
+
+
+def test_parser_reads_fenced_action_blob():
+    text = 'Thought: I need the schema.\n```json\n{"action": "sql_db_schema", "action_input": "T"}\n```'
+    action = FastJSONAgentOutputParser().parse(text)
+    assert isinstance(action, AgentAction)
+    assert (action.tool, action.tool_input, action.log) == ("sql_db_schema", "T", text)
+
+
+def test_parser_reads_bare_action_blob():
+    text = 'Thought: run it.\n{"action": "sql_db_query", "action_input": {"query": "SELECT 1"}}'
+    action = FastJSONAgentOutputParser().parse(text)
+    assert (action.tool, action.tool_input) == ("sql_db_query", {"query": "SELECT 1"})
+
+
+def test_parser_keeps_sql_fences_inside_final_answer():
+    answer = "Use this query:\n```sql\nSELECT a\nFROM t\n```\nIt scans less data."
+    # Models emit the answer's newlines raw, inside the JSON string.
+    text = '{"action": "Final Answer", "action_input": "' + answer + '"}'
+    finish = FastJSONAgentOutputParser().parse(text)
+    assert isinstance(finish, AgentFinish)
+    assert finish.return_values == {"output": answer}
+
+
+def test_parser_rejects_unparseable_output():
+    with pytest.raises(OutputParserException):
+        FastJSONAgentOutputParser().parse("I think the query is fine.\n```sql\nSELECT 1\n```")
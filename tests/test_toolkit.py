@@ -0,0 +1,212 @@
+import asyncio
+from typing import List
+
+import pandas as pd
+import pytest
+from langchain_community.tools import BaseTool
+
+from Toolkit import (
+    MAX_SPECULATIVE_SCHEMAS,
+    QUERY_HISTORY_LIMIT,
+    InfoSnowflakeTableTool,
+    LazyResult,
+    ParallelPlanTool,
+    QuerySQLDataBaseTool,
+    _columns_query,
+    _push_down_query_history,
+)
+
+
+def test_unbounded_query_history_scan_gets_window_and_limit():
+    pushed = _push_down_query_history("SELECT * FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY").upper()
+    assert "START_TIME >= DATEADD" in pushed
+    assert f"LIMIT {QUERY_HISTORY_LIMIT}" in pushed
+
+
+def test_existing_limit_is_kept():
+    pushed = _push_down_query_history("SELECT * FROM QUERY_HISTORY LIMIT 5").upper()
+    assert "WHERE QUERY_HISTORY.START_TIME >= DATEADD" in pushed
+    assert "LIMIT 5" in pushed
+    assert f"LIMIT {QUERY_HISTORY_LIMIT}" not in pushed
+
+
+def test_aliased_table_predicate_uses_the_alias():
+    pushed = _push_down_query_history("SELECT qh.QUERY_ID FROM QUERY_HISTORY AS qh").upper()
+    assert "WHERE QH.START_TIME >= DATEADD" in pushed
+    assert f"LIMIT {QUERY_HISTORY_LIMIT}" in pushed
+
+
+def test_bounded_query_is_returned_unchanged():
+    query = "select query_id from query_history qh where qh.start_time > '2024-01-01' limit 5"
+    assert _push_down_query_history(query) == query
+
+
+def test_other_tables_are_returned_unchanged():
+    query = "SELECT * FROM my_db.my_schema.orders"
+    assert _push_down_query_history(query) == query
+
+
+class _EchoTool(BaseTool):
+    name: str = "echo"
+    description: str = "Return the text."
+
+    def _run(self, text: str) -> str:
+        return text
+
+    async def _arun(self, text: str) -> str:
+        return text
+
+
+class _RendezvousTool(BaseTool):
+    """Only returns once `parties` calls are in flight at the same time."""
+
+    name: str = "rendezvous"
+    description: str = "Wait for the other calls."
+    parties: int = 2
+    arrived: List[str] = []
+
+    def _run(self, text: str) -> str:
+        raise NotImplementedError
+
+    async def _arun(self, text: str) -> str:
+        self.arrived.append(text)
+        while len(self.arrived) < self.parties:
+            await asyncio.sleep(0.01)
+        return text
+
+
+class _QueryTextTool(BaseTool):
+    name: str = "query_text"
+    description: str = "Return a QUERY_HISTORY-like result."
+    query_texts: List[str] = []
+
+    def _run(self, text: str) -> LazyResult:
+        return LazyResult("query-id", frame=pd.DataFrame({"QUERY_TEXT": self.query_texts}))
+
+    async def _arun(self, text: str) -> LazyResult:
+        return self._run(text)
+
+
+class _SchemaTool(InfoSnowflakeTableTool):
+    requests: List[str] = []
+
+    async def _arun(self, table_names: str) -> str:
+        self.requests.append(table_names)
+        return f"schema of {table_names}"
+
+
+def _run_plan(plan, *tools):
+    return asyncio.run(ParallelPlanTool(tools=list(tools)).arun({"plan": plan}))
+
+
+def test_plan_runs_independent_steps_concurrently():
+    plan = [
+        {"id": 1, "tool": "rendezvous", "args": {"text": "a"}},
+        {"id": 2, "tool": "rendezvous", "args": {"text": "b"}},
+    ]
+    output = asyncio.run(asyncio.wait_for(
+        ParallelPlanTool(tools=[_RendezvousTool()]).arun({"plan": plan}), timeout=5
+    ))
+    assert "Result of step 1 (rendezvous):\na" in output
+    assert "Result of step 2 (rendezvous):\nb" in output
+
+
+def test_plan_substitutes_dependency_outputs():
+    plan = [
+        {"id": 2, "tool": "echo", "args": {"text": "got $1"}, "deps": [1]},
+        {"id": 1, "tool": "echo", "args": {"text": "x"}},
+    ]
+    assert "Result of step 2 (echo):\ngot x" in _run_plan(plan, _EchoTool())
+
+
+def test_plan_reports_unresolved_dependencies():
+    plan = [
+        {"id": 1, "tool": "echo", "args": {"text": "x"}, "deps": [3]},
+        {"id": 2, "tool": "echo", "args": {"text": "y"}},
+    ]
+    output = _run_plan(plan, _EchoTool())
+    assert "Result of step 1 (echo):\nError: unresolved dependencies [3]" in output
+    assert "Result of step 2 (echo):\ny" in output
+
+
+@pytest.mark.parametrize(
+    "plan",
+    [
+        "not json",
+        '{"id": 1}',
+        '[{"id": 1, "tool": "echo", "args": {"text": "x"}, "deps": null}]',
+        '[{"id": 1, "tool": "echo", "args": {"text": "x"}, "deps": ["a"]}]',
+        '[{"id": 1, "tool": "echo", "args": null}]',
+        '[{"id": 1, "tool": "echo", "args": "T"}]',
+        '[{"id": "x", "tool": "echo", "args": {"text": "x"}}]',
+        '[{"id": 1, "tool": ["echo"], "args": {"text": "x"}}]',
+        '[{"id": 1, "tool": "echo", "args": {"text": "x"}}, {"id": 1, "tool": "echo", "args": {"text": "y"}}]',
+    ],
+)
+def test_malformed_plan_returns_error(plan):
+    assert _run_plan(plan, _EchoTool()).startswith("Error:")
+
+
+def test_speculative_schemas_skip_requested_tables_and_are_capped():
+    tables = [f"DB.S.T{i}" for i in range(MAX_SPECULATIVE_SCHEMAS + 5)]
+    query_tool = _QueryTextTool(query_texts=[f"SELECT * FROM {t}" for t in tables])
+    schema_tool = _SchemaTool(pool=None)
+    plan = [
+        {"id": 1, "tool": "query_text", "args": {"text": ""}},
+        {"id": 2, "tool": "sql_db_schema", "args": {"table_names": "DB.S.T0, DB.S.T1"}},
+    ]
+    output = _run_plan(plan, query_tool, schema_tool)
+    speculated = [t for t in schema_tool.requests if t != "DB.S.T0, DB.S.T1"]
+    assert len(speculated) == MAX_SPECULATIVE_SCHEMAS
+    assert "DB.S.T0" not in speculated and "DB.S.T1" not in speculated
+    assert "Prefetched schemas:" in output
+
+
+def test_bounded_query_history_scan_is_reported_to_the_agent(monkeypatch):
+    monkeypatch.setattr(
+        "Toolkit._run_lazy", lambda pool, sql: LazyResult("query-id", frame=pd.DataFrame({"N": [1]}))
+    )
+    output = str(QuerySQLDataBaseTool(pool=None).run({"query": "SELECT COUNT(*) FROM QUERY_HISTORY"}))
+    assert "Note: the QUERY_HISTORY scan was bounded" in output
+    assert "START_TIME >= DATEADD" in output.upper()
+
+
+def test_unbounded_other_query_has_no_note(monkeypatch):
+    monkeypatch.setattr(
+        "Toolkit._run_lazy", lambda pool, sql: LazyResult("query-id", frame=pd.DataFrame({"N": [1]}))
+    )
+    output = str(QuerySQLDataBaseTool(pool=None).run({"query": "SELECT COUNT(*) FROM orders"}))
+    assert "Note:" not in output
+
+
+def test_columns_query_binds_one_pair_per_table():
+    query, params, _ = _columns_query("DB", ["DB.S1.A", 'DB."s2".B'])
+    assert query.count("?") == len(params) == 4
+    assert params == ["S1", "A", "s2", "B"]
+
+
+class _Batch:
+    def __init__(self, rows):
+        self.rowcount = len(rows)
+        self.rows = rows
+        self.downloads = 0
+
+    def to_pandas(self):
+        self.downloads += 1
+        return pd.DataFrame({"N": self.rows})
+
+
+def test_lazy_result_downloads_only_the_batches_it_needs():
+    batches = [_Batch([1, 2]), _Batch([3, 4]), _Batch([5])]
+    result = LazyResult("query-id", batches=batches, columns=["N"])
+    assert result.to_pandas(limit=2)["N"].tolist() == [1, 2]
+    assert [b.downloads for b in batches] == [1, 0, 0]
+    assert result.materialize()["N"].tolist() == [1, 2, 3, 4, 5]
+    assert [b.downloads for b in batches] == [1, 1, 1]
+
+
+def test_empty_lazy_result_keeps_column_names():
+    result = LazyResult("query-id", batches=[], columns=["QUERY_ID", "QUERY_TEXT"])
+    assert list(result.to_pandas().columns) == ["QUERY_ID", "QUERY_TEXT"]
+    assert list(result.materialize().columns) == ["QUERY_ID", "QUERY_TEXT"]
+    assert "QUERY_TEXT" in str(result)